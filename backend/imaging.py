@@ -0,0 +1,44 @@
+"""Upload image preprocessing; kept free of app dependencies so it can be tested alone"""
+import io
+
+from PIL import Image
+
+MAX_IMAGE_SIZE = 1920
+# JPEGs up to this size are forwarded as-is when no resize is needed
+PASSTHROUGH_MAX_BYTES = 1024 * 1024
+
+
+def has_metadata(image: Image.Image) -> bool:
+    """Whether a JPEG carries anything beyond its JFIF header (EXIF, XMP, comments...)"""
+    if 'comment' in image.info:
+        return True
+    return any(marker != 'APP0' for marker, _ in getattr(image, 'applist', []))
+
+
+def preprocess_image(contents: bytes) -> bytes:
+    """Decode, downscale to MAX_IMAGE_SIZE and re-encode an upload as JPEG if needed"""
+    image = Image.open(io.BytesIO(contents))
+    
+    # Already a small RGB JPEG with no metadata: header fields are enough, skip
+    # decode and re-encode. Re-encoding is what strips EXIF (GPS, device, time)
+    if (image.format == 'JPEG' and image.mode == 'RGB' and not has_metadata(image)
+            and max(image.size) <= MAX_IMAGE_SIZE and len(contents) <= PASSTHROUGH_MAX_BYTES):
+        return contents
+    
+    # Let libjpeg decode at a reduced scale; the draft box must keep the aspect
+    # ratio, since a square box only reduces when both sides exceed it
+    if max(image.size) > MAX_IMAGE_SIZE:
+        scale = MAX_IMAGE_SIZE / max(image.size)
+        image.draft('RGB', (max(1, int(image.width * scale)), max(1, int(image.height * scale))))
+    
+    # Convert to RGB if needed
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    # Resize if too large
+    if image.width > MAX_IMAGE_SIZE or image.height > MAX_IMAGE_SIZE:
+        image.thumbnail((MAX_IMAGE_SIZE, MAX_IMAGE_SIZE), Image.Resampling.LANCZOS)
+    
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=85)
+    return buffered.getvalue()
@@ -0,0 +1,43 @@
+"""One-time migration: convert ISO string analysis_date values to BSON dates"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+async def migrate():
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL'))
+    db = client[os.environ.get('DB_NAME')]
+
+    updates = []
+    cursor = db.analyses.find(
+        {"analysis_date": {"$type": "string"}},
+        {"_id": 1, "analysis_date": 1}
+    )
+    async for analysis in cursor:
+        analysis_date = datetime.fromisoformat(analysis['analysis_date'])
+        if analysis_date.tzinfo is None:
+            analysis_date = analysis_date.replace(tzinfo=timezone.utc)
+        updates.append(UpdateOne(
+            {"_id": analysis['_id']},
+            {"$set": {"analysis_date": analysis_date}}
+        ))
+
+    if updates:
+        result = await db.analyses.bulk_write(updates, ordered=False)
+        print(f"Migrated {result.modified_count} analyses")
+    else:
+        print("Nothing to migrate")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
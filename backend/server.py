@@ -1,40 +1,67 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Request, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+from gridfs.errors import NoFile
 import os
+import asyncio
+import hashlib
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional
 import uuid
+import time
+import threading
 from datetime import datetime, timezone, timedelta
 import bcrypt
 import jwt
+from cachetools import TTLCache
 from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
 import base64
-from PIL import Image
-import io
+import orjson
+from imaging import preprocess_image
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL')
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ.get('DB_NAME')]
+# Analysis images live in GridFS; analysis docs only keep the file id
+images_fs = AsyncIOMotorGridFSBucket(db, bucket_name="images")
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 168  # 7 days
+JWT_SECRET_BYTES = JWT_SECRET.encode('utf-8')
+JWT_ALGORITHMS = [JWT_ALGORITHM]
+# Reusable decoder; every token we issue carries exp
+jwt_decoder = jwt.PyJWT(options={"require": ["exp"]})
+
+# Verified token cache: raw token -> (user_id, exp timestamp)
+# Only successful decodes are cached; entries also expire with the token itself
+_token_cache = TTLCache(maxsize=10_000, ttl=300)
+_token_cache_lock = threading.Lock()
+
+# Password hashing cost (each +1 doubles hashing time)
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+
+# Allowed CORS origins, parsed once; an empty value disables CORS entirely
+CORS_ORIGINS = tuple(
+    origin.strip() for origin in os.environ.get('CORS_ORIGINS', '*').split(',') if origin.strip()
+)
 
 # Emergent LLM Key
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -70,6 +97,16 @@ class AnalysisResult(BaseModel):
     progress_score: Optional[float] = None
     image_base64: Optional[str] = None
 
+class AnalysisResponse(BaseModel):
+    id: str
+    user_id: str
+    analysis_date: datetime
+    muscle_groups: dict
+    weak_areas: List[str]
+    exercises: List[dict]
+    overall_assessment: str
+    progress_score: int
+
 class ProgressStats(BaseModel):
     total_analyses: int
     current_streak: int
@@ -82,34 +119,82 @@ def create_token(user_id: str) -> str:
         'user_id': user_id,
         'exp': datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return jwt.encode(payload, JWT_SECRET_BYTES, algorithm=JWT_ALGORITHM)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match already names this ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return any(tag.strip() == etag for tag in if_none_match.split(","))
+
+def set_cache_headers(response: Response, etag: str, cache_control: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    # Responses depend on the bearer token, never reuse them across users
+    response.headers["Vary"] = "Authorization"
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_cache_headers(response, etag, cache_control)
+    return response
+
+async def hash_password(password: str) -> str:
+    """Hash a password with bcrypt on a worker thread"""
+    hashed = await asyncio.to_thread(
+        bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    )
+    return hashed.decode('utf-8')
+
+async def check_password(password: str, password_hash: str) -> bool:
+    """Verify a password against its bcrypt hash on a worker thread"""
+    return await asyncio.to_thread(
+        bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8')
+    )
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    token = credentials.credentials
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+    if cached is not None:
+        user_id, exp = cached
+        if exp > time.time():
+            return user_id
+        with _token_cache_lock:
+            _token_cache.pop(token, None)
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload['user_id']
+        payload = jwt_decoder.decode(token, JWT_SECRET_BYTES, algorithms=JWT_ALGORITHMS)
+        user_id = payload['user_id']
+        with _token_cache_lock:
+            _token_cache[token] = (user_id, payload['exp'])
+        return user_id
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-async def analyze_body_image(image_base64: str) -> dict:
-    """Analyze body image using Gemini 3 Flash with vision"""
-    try:
-        # Create a new LlmChat instance for each analysis
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="You are an expert fitness and body composition analyzer. Analyze body photos to identify muscle groups, assess development, and provide specific recommendations."
-        )
-        chat.with_model("gemini", "gemini-3-flash-preview")
-        
-        # Create image content
-        image_content = ImageContent(image_base64=image_base64)
-        
-        # Create analysis prompt
-        prompt = """Analyze this body photo and provide a detailed assessment in JSON format:
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 15 * 1024 * 1024))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Read an image upload in chunks, rejecting non-images and oversize files"""
+    if not (file.content_type or '').startswith('image/'):
+        raise HTTPException(status_code=415, detail="File must be an image")
+    
+    too_large = HTTPException(status_code=413, detail=f"Image exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise too_large
+    
+    contents = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        contents += chunk
+        if len(contents) > MAX_UPLOAD_BYTES:
+            raise too_large
+    return bytes(contents)
+
+ANALYSIS_SYSTEM_MESSAGE = "You are an expert fitness and body composition analyzer. Analyze body photos to identify muscle groups, assess development, and provide specific recommendations."
+
+ANALYSIS_PROMPT = """Analyze this body photo and provide a detailed assessment in JSON format:
 {
   "muscle_groups": {
     "chest": "weak/moderate/strong",
@@ -133,17 +218,34 @@ async def analyze_body_image(image_base64: str) -> dict:
 }
 
 Provide 4-5 specific exercises with clear instructions based on the weak areas identified."""
+
+def new_analysis_chat() -> LlmChat:
+    """Create a fresh chat session for one analysis"""
+    # LlmChat keeps per-session message history, so instances must not be
+    # shared between users; the SDK's HTTP connection pool is already shared
+    return LlmChat(
+        api_key=EMERGENT_LLM_KEY,
+        session_id=str(uuid.uuid4()),
+        system_message=ANALYSIS_SYSTEM_MESSAGE
+    ).with_model("gemini", "gemini-3-flash-preview")
+
+async def analyze_body_image(image_bytes: bytes) -> dict:
+    """Analyze body image using Gemini 3 Flash with vision"""
+    try:
+        chat = new_analysis_chat()
+        
+        # The SDK only accepts base64; encode at the call boundary only
+        image_content = ImageContent(image_base64=base64.b64encode(image_bytes).decode('ascii'))
         
         # Send message with image
         user_message = UserMessage(
-            text=prompt,
+            text=ANALYSIS_PROMPT,
             file_contents=[image_content]
         )
         
         response = await chat.send_message(user_message)
         
         # Parse JSON response
-        import json
         # Extract JSON from response (handling potential markdown formatting)
         response_text = response.strip()
         if '```json' in response_text:
@@ -151,7 +253,9 @@ Provide 4-5 specific exercises with clear instructions based on the weak areas i
         elif '```' in response_text:
             response_text = response_text.split('```')[1].split('```')[0]
         
-        analysis_data = json.loads(response_text.strip())
+        analysis_data = orjson.loads(response_text.strip())
+        if not isinstance(analysis_data, dict):
+            raise ValueError(f"Expected a JSON object, got {type(analysis_data).__name__}")
         return analysis_data
         
     except Exception as e:
@@ -249,25 +353,24 @@ async def fetch_exercise_images(exercise_names: List[str]) -> List[str]:
 # Auth Endpoints
 @api_router.post("/auth/register")
 async def register(user_data: UserRegister):
-    # Check if user exists
-    existing_user = await db.users.find_one({"email": user_data.email})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
     # Hash password
-    hashed_password = bcrypt.hashpw(user_data.password.encode('utf-8'), bcrypt.gensalt())
+    hashed_password = await hash_password(user_data.password)
     
     # Create user
     user_id = str(uuid.uuid4())
     user_doc = {
         "id": user_id,
         "email": user_data.email,
-        "password_hash": hashed_password.decode('utf-8'),
+        "password_hash": hashed_password,
         "name": user_data.name,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.users.insert_one(user_doc)
+    # Unique index on email rejects duplicate registrations
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # Generate token
     token = create_token(user_id)
@@ -289,7 +392,7 @@ async def login(credentials: UserLogin):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Verify password
-    if not bcrypt.checkpw(credentials.password.encode('utf-8'), user['password_hash'].encode('utf-8')):
+    if not await check_password(credentials.password, user['password_hash']):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Generate token
@@ -305,40 +408,44 @@ async def login(credentials: UserLogin):
     }
 
 @api_router.get("/auth/me")
-async def get_current_user(user_id: str = Depends(verify_token)):
+async def get_current_user(request: Request, response: Response, user_id: str = Depends(verify_token)):
     user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    
+    # Profile data rarely changes; let the browser revalidate cheaply
+    digest = hashlib.blake2b(orjson.dumps(user, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+    etag = f'"{digest}"'
+    cache_control = "private, max-age=60"
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    
+    set_cache_headers(response, etag, cache_control)
     return user
 
 # Analysis Endpoints
 @api_router.post("/analysis/upload")
-async def upload_analysis(file: UploadFile = File(...), user_id: str = Depends(verify_token)):
+async def upload_analysis(file: UploadFile = File(...), user_id: str = Depends(verify_token)) -> AnalysisResponse:
+    # Validate before doing any image work
+    contents = await read_upload(file)
+    
     try:
-        # Read and validate image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize if too large (max 1920x1920)
-        max_size = 1920
-        if image.width > max_size or image.height > max_size:
-            image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-        
-        # Convert to base64
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG", quality=85)
-        image_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+        # Preprocess off the event loop
+        image_bytes = await asyncio.to_thread(preprocess_image, contents)
         
         # Analyze image
-        analysis_data = await analyze_body_image(image_base64)
+        analysis_data = await analyze_body_image(image_bytes)
+        
+        # LLM output is untrusted; coerce fields to the shapes AnalysisResponse expects
+        muscle_groups = analysis_data.get('muscle_groups')
+        muscle_groups = {str(k): str(v) for k, v in muscle_groups.items()} if isinstance(muscle_groups, dict) else {}
+        weak_areas = analysis_data.get('weak_areas')
+        weak_areas = [str(area) for area in weak_areas if area is not None] if isinstance(weak_areas, list) else []
+        exercises = analysis_data.get('exercises')
+        exercises = [ex for ex in exercises if isinstance(ex, dict)] if isinstance(exercises, list) else []
         
         # Fetch exercise images
-        exercises = analysis_data.get('exercises', [])
-        exercise_images = await fetch_exercise_images([ex.get('name', '') for ex in exercises])
+        exercise_images = await fetch_exercise_images([str(ex.get('name') or '') for ex in exercises])
         
         # Add images to exercises
         for i, exercise in enumerate(exercises):
@@ -347,35 +454,34 @@ async def upload_analysis(file: UploadFile = File(...), user_id: str = Depends(v
             else:
                 exercise['image_url'] = "https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b?w=400&h=300&fit=crop&q=80"
         
-        # Create analysis record
+        # Create analysis record before storing anything
         analysis_id = str(uuid.uuid4())
-        analysis_date = datetime.now(timezone.utc)
-        analysis_doc = {
-            "id": analysis_id,
-            "user_id": user_id,
-            "analysis_date": analysis_date.isoformat(),
-            "muscle_groups": analysis_data.get('muscle_groups', {}),
-            "weak_areas": analysis_data.get('weak_areas', []),
-            "exercises": exercises,
-            "overall_assessment": analysis_data.get('overall_assessment', ''),
-            "image_base64": image_base64,
-            "progress_score": calculate_progress_score(analysis_data.get('muscle_groups', {}))
-        }
+        analysis = AnalysisResponse(
+            id=analysis_id,
+            user_id=user_id,
+            analysis_date=datetime.now(timezone.utc),
+            muscle_groups=muscle_groups,
+            weak_areas=weak_areas,
+            exercises=exercises,
+            overall_assessment=str(analysis_data.get('overall_assessment') or ''),
+            progress_score=calculate_progress_score(muscle_groups)
+        )
         
-        # Insert without _id field
-        result = await db.analyses.insert_one(analysis_doc)
+        image_id = await images_fs.upload_from_stream(
+            f"{analysis_id}.jpg",
+            image_bytes,
+            metadata={"user_id": user_id, "content_type": "image/jpeg"}
+        )
         
-        # Return response without MongoDB _id and without image to reduce payload
-        return {
-            "id": analysis_id,
-            "user_id": user_id,
-            "analysis_date": analysis_date,
-            "muscle_groups": analysis_doc["muscle_groups"],
-            "weak_areas": analysis_doc["weak_areas"],
-            "exercises": analysis_doc["exercises"],
-            "overall_assessment": analysis_doc["overall_assessment"],
-            "progress_score": analysis_doc["progress_score"]
-        }
+        # Same model backs the stored document (plus the image reference) and the response
+        try:
+            await db.analyses.insert_one({**analysis.model_dump(), "image_id": image_id})
+        except Exception:
+            # Don't leave an orphaned image behind
+            await images_fs.delete(image_id)
+            raise
+        
+        return analysis
         
     except Exception as e:
         logging.error(f"Error processing upload: {str(e)}")
@@ -383,50 +489,138 @@ async def upload_analysis(file: UploadFile = File(...), user_id: str = Depends(v
         logging.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
-def calculate_progress_score(muscle_groups: dict) -> float:
-    """Calculate overall progress score from muscle group assessments"""
-    score_map = {"weak": 33, "moderate": 66, "strong": 100}
-    scores = [score_map.get(level, 50) for level in muscle_groups.values()]
-    return sum(scores) / len(scores) if scores else 50.0
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+PROGRESS_SCORE_MAP = {"weak": 33, "moderate": 66, "strong": 100}
+
+def calculate_progress_score(muscle_groups: dict) -> int:
+    """Calculate overall progress score (0-100) from muscle group assessments"""
+    if not muscle_groups:
+        return 50
+    total = 0
+    for level in muscle_groups.values():
+        total += PROGRESS_SCORE_MAP.get(level, 50)
+    return total // len(muscle_groups)
+
+def encode_history_cursor(analysis: dict) -> str:
+    """Opaque cursor for the (analysis_date, id) position of a history item"""
+    raw = orjson.dumps([analysis['analysis_date'].isoformat(), analysis['id']])
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_history_cursor(cursor: str) -> tuple:
+    try:
+        analysis_date, analysis_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(analysis_date), str(analysis_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @api_router.get("/analysis/history")
-async def get_analysis_history(user_id: str = Depends(verify_token)):
+async def get_analysis_history(
+    response: Response,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user_id: str = Depends(verify_token)
+):
+    # Newest first; id breaks ties between analyses stored in the same millisecond
+    query = {"user_id": user_id}
+    if cursor:
+        cursor_date, cursor_id = decode_history_cursor(cursor)
+        query["$or"] = [
+            {"analysis_date": {"$lt": cursor_date}},
+            {"analysis_date": cursor_date, "id": {"$lt": cursor_id}}
+        ]
+    
+    # Only the fields the history views render
     analyses = await db.analyses.find(
-        {"user_id": user_id},
-        {"_id": 0, "image_base64": 0}
-    ).sort("analysis_date", -1).to_list(100)
+        query,
+        {
+            "_id": 0,
+            "id": 1,
+            "analysis_date": 1,
+            "progress_score": 1,
+            "muscle_groups": 1,
+            "weak_areas": 1,
+            "exercise_count": {"$size": {"$ifNull": ["$exercises", []]}}
+        }
+    ).sort([("analysis_date", -1), ("id", -1)]).limit(limit).to_list(limit)
     
-    # Convert ISO strings to datetime for response
-    for analysis in analyses:
-        if isinstance(analysis.get('analysis_date'), str):
-            analysis['analysis_date'] = datetime.fromisoformat(analysis['analysis_date'])
+    # Pass the returned cursor back to fetch the next page
+    if len(analyses) == limit:
+        response.headers["X-Next-Cursor"] = encode_history_cursor(analyses[-1])
     
     return analyses
 
 @api_router.get("/analysis/{analysis_id}")
-async def get_analysis(analysis_id: str, user_id: str = Depends(verify_token)):
+async def get_analysis(analysis_id: str, request: Request, response: Response, user_id: str = Depends(verify_token)):
+    # Analyses are immutable once created, so the id (scoped to the user) is a stable validator
+    etag = f'W/"{analysis_id}.{user_id}"'
+    cache_control = "private, max-age=3600, immutable"
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    
     analysis = await db.analyses.find_one(
         {"id": analysis_id, "user_id": user_id},
-        {"_id": 0}
+        {"_id": 0, "image_id": 0, "image_base64": 0}
     )
     
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found")
     
-    # Convert ISO string to datetime
-    if isinstance(analysis.get('analysis_date'), str):
-        analysis['analysis_date'] = datetime.fromisoformat(analysis['analysis_date'])
-    
+    set_cache_headers(response, etag, cache_control)
     return analysis
 
+@api_router.get("/analysis/{analysis_id}/image")
+async def get_analysis_image(analysis_id: str, user_id: str = Depends(verify_token)):
+    analysis = await db.analyses.find_one(
+        {"id": analysis_id, "user_id": user_id},
+        {"_id": 0, "image_id": 1, "image_base64": 1}
+    )
+    
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    # Older analyses still carry the image inline
+    if analysis.get('image_base64'):
+        return Response(content=base64.b64decode(analysis['image_base64']), media_type="image/jpeg")
+    
+    if not analysis.get('image_id'):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    try:
+        grid_out = await images_fs.open_download_stream(analysis['image_id'])
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    async def iter_chunks():
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+    
+    return StreamingResponse(
+        iter_chunks(),
+        media_type="image/jpeg",
+        headers={"Content-Length": str(grid_out.length)}
+    )
+
 @api_router.get("/progress/stats")
 async def get_progress_stats(user_id: str = Depends(verify_token)):
-    analyses = await db.analyses.find(
-        {"user_id": user_id},
-        {"_id": 0, "analysis_date": 1, "progress_score": 1, "muscle_groups": 1}
-    ).sort("analysis_date", 1).to_list(1000)
+    results = await db.analyses.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$sort": {"analysis_date": 1}},
+        {"$group": {
+            "_id": "$user_id",
+            "total": {"$sum": 1},
+            "first_score": {"$first": "$progress_score"},
+            "last_score": {"$last": "$progress_score"},
+            "latest_groups": {"$last": "$muscle_groups"},
+            "dates": {"$push": "$analysis_date"}
+        }}
+    ]).to_list(1)
     
-    if not analyses:
+    if not results:
         return {
             "total_analyses": 0,
             "current_streak": 0,
@@ -434,46 +628,40 @@ async def get_progress_stats(user_id: str = Depends(verify_token)):
             "muscle_development": {}
         }
     
-    # Calculate stats
-    total_analyses = len(analyses)
+    stats = results[0]
+    total_analyses = stats['total']
     
     # Calculate streak
-    current_streak = calculate_streak(analyses)
+    current_streak = calculate_streak(stats['dates'])
     
     # Calculate improvement
-    if len(analyses) >= 2:
-        first_score = analyses[0].get('progress_score', 50)
-        last_score = analyses[-1].get('progress_score', 50)
+    if total_analyses >= 2:
+        first_score = stats.get('first_score')
+        last_score = stats.get('last_score')
+        first_score = 50 if first_score is None else first_score
+        last_score = 50 if last_score is None else last_score
         improvement = ((last_score - first_score) / first_score) * 100 if first_score > 0 else 0
     else:
         improvement = 0.0
     
-    # Get muscle development trend
-    muscle_dev = {}
-    if analyses:
-        latest_groups = analyses[-1].get('muscle_groups', {})
-        for muscle, level in latest_groups.items():
-            muscle_dev[muscle] = level
-    
     return {
         "total_analyses": total_analyses,
         "current_streak": current_streak,
         "improvement_percentage": round(improvement, 1),
-        "muscle_development": muscle_dev
+        "muscle_development": stats.get('latest_groups') or {}
     }
 
-def calculate_streak(analyses: List[dict]) -> int:
-    """Calculate current streak of consecutive days"""
-    if not analyses:
+def calculate_streak(dates: List[datetime]) -> int:
+    """Calculate current streak of consecutive days from ascending analysis dates"""
+    if not dates:
         return 0
     
+    # Compare calendar days; each date is converted exactly once
+    days = [d.date() for d in dates]
+    
     streak = 1
-    for i in range(len(analyses) - 1, 0, -1):
-        current_date = datetime.fromisoformat(analyses[i]['analysis_date'])
-        prev_date = datetime.fromisoformat(analyses[i-1]['analysis_date'])
-        diff = (current_date - prev_date).days
-        
-        if diff <= 1:
+    for i in range(len(days) - 1, 0, -1):
+        if (days[i] - days[i-1]).days <= 1:
             streak += 1
         else:
             break
@@ -483,13 +671,16 @@ def calculate_streak(analyses: List[dict]) -> int:
 # Include the router in the main app
 app.include_router(api_router)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+if CORS_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        # Wildcard origins cannot be combined with credentials; auth uses bearer headers anyway
+        allow_credentials='*' not in CORS_ORIGINS,
+        allow_origins=CORS_ORIGINS,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
+    )
 
 # Configure logging
 logging.basicConfig(
@@ -498,10 +689,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    await db.users.create_index("email", unique=True)
+    await db.users.create_index("id", unique=True)
+    await db.analyses.create_index("id", unique=True)
+    await db.analyses.create_index([("user_id", 1), ("analysis_date", -1), ("id", -1)])
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
-    
-    import os
-port = int(os.environ.get("PORT", 5000))
-app.run(host="0.0.0.0", port=port)
\ No newline at end of file
+
+if __name__ == "__main__":
+    # Equivalent CLI: uvicorn server:app --loop uvloop --http httptools --workers $(nproc)
+    import uvicorn
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=int(os.environ.get("PORT", 5000)),
+        workers=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+    )
@@ -11,12 +11,34 @@ export default function AnalysisPage() {
   const { id } = useParams();
   const navigate = useNavigate();
   const [analysis, setAnalysis] = useState(null);
+  const [imageUrl, setImageUrl] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     loadAnalysis();
   }, [id]);
 
+  useEffect(() => {
+    let objectUrl = null;
+    const loadImage = async () => {
+      try {
+        const token = localStorage.getItem('token');
+        const response = await axios.get(`${API}/analysis/${id}/image`, {
+          headers: { Authorization: `Bearer ${token}` },
+          responseType: 'blob'
+        });
+        objectUrl = URL.createObjectURL(response.data);
+        setImageUrl(objectUrl);
+      } catch (error) {
+        setImageUrl(null);
+      }
+    };
+    loadImage();
+    return () => {
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [id]);
+
   const loadAnalysis = async () => {
     try {
       const token = localStorage.getItem('token');
@@ -90,10 +112,10 @@ export default function AnalysisPage() {
                 </p>
               </div>
 
-              {analysis.image_base64 && (
+              {imageUrl && (
                 <div className="rounded-lg overflow-hidden border border-slate-800 mb-6">
                   <img
-                    src={`data:image/jpeg;base64,${analysis.image_base64}`}
+                    src={imageUrl}
                     alt="Body analysis"
                     className="w-full h-auto"
                     data-testid="analysis-image"
@@ -27,7 +27,7 @@ export default function Dashboard() {
 
       const [userRes, analysesRes, statsRes] = await Promise.all([
         axios.get(`${API}/auth/me`, config),
-        axios.get(`${API}/analysis/history`, config),
+        axios.get(`${API}/analysis/history`, { ...config, params: { limit: 6 } }),
         axios.get(`${API}/progress/stats`, config)
       ]);
 
@@ -237,11 +237,11 @@ export default function Dashboard() {
                         </div>
                       </div>
                     )}
-                    {analysis.exercises && analysis.exercises.length > 0 && (
+                    {analysis.exercise_count > 0 && (
                       <div className="mt-2">
                         <div className="text-xs font-medium text-slate-900 mb-1">Exercises:</div>
                         <div className="text-sm text-green-600">
-                          {analysis.exercises.length} recommended
+                          {analysis.exercise_count} recommended
                         </div>
                       </div>
                     )}
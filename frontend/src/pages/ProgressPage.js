@@ -24,7 +24,7 @@ export default function ProgressPage() {
       const config = { headers: { Authorization: `Bearer ${token}` } };
 
       const [analysesRes, statsRes] = await Promise.all([
-        axios.get(`${API}/analysis/history`, config),
+        axios.get(`${API}/analysis/history`, { ...config, params: { limit: 100 } }),
         axios.get(`${API}/progress/stats`, config)
       ]);
 
@@ -0,0 +1,64 @@
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from imaging import MAX_IMAGE_SIZE, preprocess_image  # noqa: E402
+
+
+def encode(image, format, **params):
+    buffered = io.BytesIO()
+    image.save(buffered, format=format, **params)
+    return buffered.getvalue()
+
+
+def make_jpeg(width, height, **params):
+    return encode(Image.new('RGB', (width, height), (120, 80, 40)), "JPEG", **params)
+
+
+def test_large_jpeg_is_downscaled():
+    result = Image.open(io.BytesIO(preprocess_image(make_jpeg(4000, 3000))))
+
+    assert result.format == 'JPEG'
+    assert result.size == (MAX_IMAGE_SIZE, 1440)
+
+
+def test_extreme_aspect_jpeg_is_downscaled():
+    result = Image.open(io.BytesIO(preprocess_image(make_jpeg(4000, 2))))
+
+    assert max(result.size) <= MAX_IMAGE_SIZE
+
+
+def test_non_rgb_png_is_converted_to_jpeg():
+    png = encode(Image.new('RGBA', (800, 600), (10, 20, 30, 128)), "PNG")
+    result = Image.open(io.BytesIO(preprocess_image(png)))
+
+    assert result.format == 'JPEG'
+    assert result.mode == 'RGB'
+    assert result.size == (800, 600)
+
+
+def test_small_jpeg_passes_through_unchanged():
+    contents = make_jpeg(800, 600)
+
+    assert preprocess_image(contents) == contents
+
+
+def test_small_jpeg_with_exif_is_stripped():
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"  # Make
+    exif[0x0112] = 6  # Orientation
+    contents = make_jpeg(800, 600, exif=exif.tobytes())
+    assert Image.open(io.BytesIO(contents)).getexif()
+
+    result = preprocess_image(contents)
+
+    assert result != contents
+    stripped = Image.open(io.BytesIO(result))
+    assert 'exif' not in stripped.info
+    assert not stripped.getexif()